@@ -0,0 +1,115 @@
+import argparse
+import copy
+import math
+import random
+import sys
+import time
+from collections import Counter
+from components.solver import Solver
+from components.obstacle import RectObstacle, CircleObstacle
+from components.backend import NumbaBackend
+
+WIDTH, HEIGHT = 900, 900
+
+def make_scene(seed):
+    # 기체/불은 난수를 쓰므로 결정적인 재질만 사용
+    random.seed(seed)
+    solver = Solver(WIDTH, HEIGHT)
+    solver.add_obstacle(RectObstacle(WIDTH/2, HEIGHT - 20, WIDTH, 40))
+    solver.add_obstacle(CircleObstacle(450, 600, 30))
+    solver.add_obstacle(RectObstacle(300, 500, 60, 30))
+    for k in range(4):
+        for row, p_type in enumerate(["water", "sand", "stone"]):
+            solver.spawn_region(200 + k * 100, 150 + row * 60, p_type, 5, 5)
+    return solver
+
+def make_reactive_scene(seed):
+    random.seed(seed)
+    solver = Solver(WIDTH, HEIGHT)
+    solver.add_obstacle(RectObstacle(WIDTH/2, HEIGHT - 20, WIDTH, 40))
+    solver.spawn_rect(300, 830, 160, 60, "sand")
+    solver.spawn_rect(600, 830, 160, 60, "water")
+    return solver
+
+def type_totals(solver):
+    totals = Counter(p.type for p in solver.particles)
+    totals["burning"] = sum(p.is_burning for p in solver.particles)
+    totals["total"] = len(solver.particles)
+    return totals
+
+def run_reactive(solver, frames, totals):
+    # 모래/물 밑으로 불을 넣어 점화, 연기, 증기 반응을 일으키고 10 프레임마다 타입별 개수를 누적
+    for f in range(frames):
+        if f % 5 == 0 and f < frames // 2:
+            for x in (260, 300, 340, 560, 600, 640):
+                solver.add_particle(x, 850, "fire")
+        solver.update(1/120)
+        if f % 10 == 9: totals.update(type_totals(solver))
+
+def run(solver, frames):
+    start = time.perf_counter()
+    for f in range(frames):
+        if f == frames // 3: solver.set_attractor(450, 300, 250000.0)
+        if f == frames * 2 // 3: solver.clear_attractor()
+        solver.update(1/120)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reactive-frames", type=int, default=240)
+    parser.add_argument("--reactive-runs", type=int, default=3)
+    parser.add_argument("--count-tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    numba = NumbaBackend(background=False)
+    if numba.status != "ready":
+        print("Numba backend is", numba.status)
+        sys.exit(1)
+
+    ok = True
+    for use_grid in (True, False):
+        reference = make_scene(args.seed)
+        reference.use_optimization = use_grid
+        compiled = copy.deepcopy(reference)
+        compiled.backend = "numba"
+        compiled.backends["numba"] = numba
+
+        t_ref = run(reference, args.frames)
+        t_nb = run(compiled, args.frames)
+
+        diff = 0.0
+        same = len(reference.particles) == len(compiled.particles)
+        for p, q in zip(reference.particles, compiled.particles):
+            diff = max(diff, abs(p.pos.x - q.pos.x), abs(p.pos.y - q.pos.y))
+            same = same and p.is_sleeping == q.is_sleeping and p.type == q.type
+        passed = same and diff <= args.tolerance
+        ok = ok and passed
+
+        mode = "grid " if use_grid else "brute"
+        print(f"{mode} : {'OK  ' if passed else 'FAIL'} max diff {diff:.3g}  "
+              f"python {t_ref:.2f}s  numba {t_nb:.2f}s  (x{t_ref / t_nb:.1f})")
+
+    # 불/증기/연기는 두 백엔드의 난수가 달라 위치를 비교할 수 없으므로
+    # 여러 번 돌려 누적한 타입별 개수가 통계적으로 비슷한지만 본다
+    ref_totals, nb_totals = Counter(), Counter()
+    for run_no in range(args.reactive_runs):
+        reference = make_reactive_scene(args.seed + run_no)
+        compiled = copy.deepcopy(reference)
+        compiled.backend = "numba"
+        compiled.backends["numba"] = numba
+        run_reactive(reference, args.reactive_frames, ref_totals)
+        run_reactive(compiled, args.reactive_frames, nb_totals)
+
+    for key in sorted(set(ref_totals) | set(nb_totals)):
+        a, b = ref_totals[key], nb_totals[key]
+        limit = args.count_tolerance * max(a, b) + 3 * math.sqrt(max(a, b))
+        passed = abs(a - b) <= limit
+        ok = ok and passed
+        print(f"react {key:8s}: {'OK  ' if passed else 'FAIL'} python {a}  numba {b}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
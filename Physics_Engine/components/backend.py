@@ -0,0 +1,206 @@
+import threading
+import pygame
+from components.obstacle import CircleObstacle, RectObstacle
+from components.particle import TYPE_CODES, TYPE_NAMES, TYPE_PROPERTIES
+
+try:
+    import numpy as np
+    from components import kernels
+except ImportError:
+    np = None
+    kernels = None
+
+class PythonBackend:
+    name = "python"
+    status = "ready"
+
+    def step(self, solver, dt, steps):
+        for _ in range(steps):
+            solver.apply_gravity()
+            solver.apply_forces()
+            solver.apply_bounds()
+            solver.solve_collisions()
+            solver.update_positions(dt)
+
+class NumbaBackend:
+    name = "numba"
+
+    def __init__(self, background=None):
+        self.fallback = PythonBackend()
+        self.ready = threading.Event()
+        self.props = None
+        self.cache = None
+        if kernels is None:
+            self.status = "unavailable"
+            return
+
+        # 타입별 (radius, mass, friction, decay) 테이블
+        self.props = np.zeros((len(TYPE_CODES), 4))
+        for name, code in TYPE_CODES.items():
+            props = TYPE_PROPERTIES[name]
+            self.props[code] = (props["radius"], props["mass"], props["friction"], props["decay"])
+
+        # 커널은 cache=True 로 디스크에 저장되므로 두 번째 실행부터는 로딩만 한다.
+        # 그래도 첫 컴파일은 수 초가 걸리니 기본값은 백그라운드 스레드에서 준비하고
+        # 그동안은 Python 백엔드로 계산한다.
+        self.status = "compiling"
+        if background is None:
+            # 창이 없는 배치/서버에서는 폴백 프레임이 섞여 측정이 틀어지지 않도록 바로 컴파일한다
+            background = pygame.display.get_surface() is not None
+        if background:
+            threading.Thread(target=self.warm_up, daemon=True).start()
+        else:
+            self.warm_up()
+
+    def warm_up(self):
+        from components.solver import Solver
+        solver = Solver(100, 100)
+        solver.add_obstacle(CircleObstacle(50, 50, 10))
+        solver.add_particle(20, 20, "water")
+        try:
+            for use_grid in (True, False):
+                solver.use_optimization = use_grid
+                self.run(solver, 0.001, 1)
+        except Exception as e:
+            # 컴파일 실패 시 ready 를 세우지 않으므로 계속 Python 백엔드로 계산하고, HUD 에 원인을 띄운다
+            self.status = "failed: {}".format(e)
+            return
+        self.status = "ready"
+        self.ready.set()
+
+    def supports(self, solver):
+        for obs in solver.obstacles:
+            if type(obs) not in (CircleObstacle, RectObstacle): return False
+        for p in solver.particles:
+            if p.type not in TYPE_CODES: return False
+        return True
+
+    def step(self, solver, dt, steps):
+        if not self.ready.is_set() or not self.supports(solver):
+            return self.fallback.step(solver, dt, steps)
+        self.run(solver, dt, steps)
+
+    def pack(self, particles):
+        n = len(particles)
+        f64 = np.float64
+        return [
+            np.fromiter((p.pos.x for p in particles), f64, n),
+            np.fromiter((p.pos.y for p in particles), f64, n),
+            np.fromiter((p.prev_pos.x for p in particles), f64, n),
+            np.fromiter((p.prev_pos.y for p in particles), f64, n),
+            np.fromiter((p.acc.x for p in particles), f64, n),
+            np.fromiter((p.acc.y for p in particles), f64, n),
+            np.fromiter((p.life for p in particles), f64, n),
+            np.fromiter((p.sleep_timer for p in particles), f64, n),
+            np.fromiter((p.burn_timer for p in particles), f64, n),
+            np.fromiter((p.max_burn_time for p in particles), f64, n),
+            np.fromiter((TYPE_CODES[p.type] for p in particles), np.int64, n),
+            np.fromiter((p.is_sleeping for p in particles), np.bool_, n),
+            np.fromiter((p.is_burning for p in particles), np.bool_, n),
+            np.fromiter((p.radius for p in particles), f64, n),
+            np.fromiter((p.mass for p in particles), f64, n),
+            np.fromiter((p.friction for p in particles), f64, n),
+            np.fromiter((p.decay for p in particles), f64, n),
+            np.fromiter((p.is_static for p in particles), np.bool_, n),
+        ]
+
+    def sync(self, solver):
+        # 직전 프레임도 이 백엔드가 같은 solver 를 계산했다면 입자 객체는 배열과 같은 상태이므로
+        # 배열을 그대로 쓰고, 추가된 입자만 새로 읽는다. 그 사이 Python 백엔드가 돌았으면 전부 다시 읽는다.
+        particles = solver.particles
+        cache = self.cache
+        if cache is None or cache["solver"] is not solver or cache["frame"] != solver.frame_count - 1 \
+                or not cache["particles"]:
+            return self.pack(particles)
+        if cache["particles"] == particles:
+            return cache["state"]
+
+        index = {id(p): i for i, p in enumerate(cache["particles"])}
+        idx = np.fromiter((index.get(id(p), -1) for p in particles), np.int64, len(particles))
+        state = [a[np.maximum(idx, 0)] for a in cache["state"]]
+        fresh = np.flatnonzero(idx < 0)
+        if len(fresh):
+            for a, b in zip(state, self.pack([particles[i] for i in fresh.tolist()])):
+                a[fresh] = b
+        return state
+
+    def run(self, solver, dt, steps):
+        particles = solver.particles
+        n = len(particles)
+        f64 = np.float64
+
+        state = self.sync(solver)
+        px, py, ox, oy, ax, ay, life, sleep_t, burn, max_burn, ptype, sleeping, burning, \
+            radius, mass, friction, decay, static = state
+        # 커널이 바꿀 수 있는 배열(앞 13개)의 이전 값. 바뀐 입자만 객체에 되돌려 쓴다.
+        before = [a.copy() for a in state[:13]]
+        invalid = np.zeros(n, np.bool_)
+
+        obstacles = solver.obstacles
+        obs_kind = np.array([kernels.CIRCLE if isinstance(o, CircleObstacle) else kernels.RECT for o in obstacles], np.int64)
+        obs_x = np.array([o.pos.x for o in obstacles], f64)
+        obs_y = np.array([o.pos.y for o in obstacles], f64)
+        obs_a = np.array([o.radius if isinstance(o, CircleObstacle) else o.w for o in obstacles], f64)
+        obs_b = np.array([0.0 if isinstance(o, CircleObstacle) else o.h for o in obstacles], f64)
+
+        # 입자는 화면 밖 1000px 까지 살아있으므로 셀 좌표도 그 범위로 제한
+        cell_size = float(solver.grid.cell_size)
+        lo_x = lo_y = int(-1000 / cell_size) - 1
+        hi_x = int((solver.width + 1000) / cell_size) + 1
+        hi_y = int((solver.height + 1000) / cell_size) + 1
+
+        attractor = solver.attractor_pos is not None
+        tx = solver.attractor_pos.x if attractor else 0.0
+        ty = solver.attractor_pos.y if attractor else 0.0
+
+        energy, max_pen = kernels.step_frame(
+            px, py, ox, oy, ax, ay, radius, mass, friction, decay, life, ptype, static,
+            sleeping, sleep_t, burning, burn, max_burn, invalid, self.props,
+            obs_kind, obs_x, obs_y, obs_a, obs_b,
+            int(steps), float(dt), float(solver.width), float(solver.height), float(solver.gravity),
+            attractor, float(tx), float(ty), float(solver.attractor_force),
+            bool(solver.use_optimization), cell_size, lo_x, hi_x, lo_y, hi_y,
+            float(solver.response_coef), float(solver.friction_coef), float(solver.floor_friction),
+            float(solver.obstacle_friction), float(solver.obstacle_water_friction),
+            float(solver.sleep_time), bool(solver.use_ccd), float(solver.ccd_threshold))
+
+        changed = np.zeros(n, np.bool_)
+        for a, b in zip(state, before):
+            changed |= a != b
+        sel = np.flatnonzero(changed)
+        rows = zip([particles[i] for i in sel.tolist()], *(a[sel].tolist() for a in state[:13]))
+        for p, x, y, prev_x, prev_y, acc_x, acc_y, p_life, p_sleep, p_burn, p_max_burn, code, p_sleeping, p_burning in rows:
+            p.pos.x, p.pos.y = x, y
+            p.prev_pos.x, p.prev_pos.y = prev_x, prev_y
+            p.acc.x, p.acc.y = acc_x, acc_y
+            p.life = p_life
+            p.sleep_timer = p_sleep
+            p.is_sleeping = p_sleeping
+            if code != TYPE_CODES[p.type]:
+                p.type = TYPE_NAMES[code]
+                p.set_type_properties(p.type)
+            if p_burning:
+                p.is_burning = True
+                p.burn_timer = p_burn
+                p.max_burn_time = p_max_burn
+                ratio = p_burn / p_max_burn if p_max_burn > 0 else 0
+                if ratio > 0.6: p.color = (255, 150, 0)
+                elif ratio > 0.3: p.color = (100, 20, 0)
+                else: p.color = (50, 50, 50)
+
+        self.cache = {"solver": solver, "frame": solver.frame_count, "particles": list(particles), "state": state}
+
+        diag = solver.diagnostics
+        diag.kinetic_energy = energy
+        diag.max_penetration = max(diag.max_penetration, max_pen)
+        if invalid.any():
+            bad = [p for p, flag in zip(particles, invalid.tolist()) if flag]
+            solver.particles = [p for p, flag in zip(particles, invalid.tolist()) if not flag]
+            solver.discard_invalid(bad)
+
+BACKENDS = {"python": PythonBackend, "numba": NumbaBackend}
+
+def create_backend(name):
+    if name not in BACKENDS:
+        raise ValueError("unknown backend: {}".format(name))
+    return BACKENDS[name]()
@@ -0,0 +1,276 @@
+import hashlib
+import itertools
+import json
+import os
+import signal
+import time
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from components.solver import Solver
+from components.obstacle import CircleObstacle, RectObstacle
+from components.spawn import spawn_from_spec
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SAMPLE_KEYS = ["step", "time", "particles", "settled_height", "kinetic_energy",
+               "max_penetration", "invalid", "sub_steps", "steps_per_sec"]
+GAS_TYPES = ["fire", "smoke", "steam"]
+# time_limit 은 작업 안에서 먼저 확인하고, 한 프레임이 끝나지 않는 경우에만 부모가 강제 종료한다
+KILL_GRACE = 2.0
+SIGKILL = getattr(signal, "SIGKILL", 9)
+# 이 속도(px/s) 이하로 움직이고, 스폰된 지 SETTLE_FRAMES 스텝이 지난 입자만 쌓인 것으로 본다
+SETTLE_SPEED = 30.0
+SETTLE_FRAMES = 30
+
+def expand_grid(base, grid):
+    # grid = {"gravity": [1000, 1500], "sub_steps": [4, 8]} -> 모든 조합의 config
+    keys = list(grid)
+    configs = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        config = json.loads(json.dumps(base))
+        params = config.setdefault("params", {})
+        params.update(zip(keys, values))
+        suffix = ",".join("{}={}".format(k, v) for k, v in zip(keys, values))
+        config["name"] = "{}[{}]".format(base.get("name", "job"), suffix)
+        configs.append(config)
+    return configs
+
+def build_solver(config):
+    params = dict(config.get("params", {}))
+    width, height = config.get("size", (900, 900))
+    solver = Solver(width, height, cell_size=params.pop("cell_size", 12.0))
+    for key, value in params.items():
+        if not hasattr(solver, key):
+            raise ValueError("unknown solver parameter: {}".format(key))
+        setattr(solver, key, value)
+
+    for obs in config.get("scene", {}).get("obstacles", []):
+        if obs["shape"] == "circle":
+            solver.add_obstacle(CircleObstacle(obs["x"], obs["y"], obs["radius"]))
+        elif obs["shape"] == "rect":
+            solver.add_obstacle(RectObstacle(obs["x"], obs["y"], obs["w"], obs["h"]))
+        else:
+            raise ValueError("unknown obstacle shape: {}".format(obs["shape"]))
+    return solver
+
+def spawn_scene(solver, config, step):
+    spawned = []
+    for spawn in config.get("scene", {}).get("spawns", []):
+        if step < spawn.get("frames", 1):
+            spawned.extend(spawn_from_spec(solver, spawn))
+    return spawned
+
+def settled_height(solver, sub_dt, max_speed=SETTLE_SPEED, fresh=()):
+    # 아직 떨어지는 입자(막 스폰된 입자 포함)는 빼야 스폰 높이가 아니라 쌓인 높이가 된다
+    top = solver.height
+    limit_sq = (max_speed * sub_dt) ** 2
+    for p in solver.particles:
+        if p.type in GAS_TYPES or id(p) in fresh: continue
+        if not p.is_sleeping:
+            vx = p.pos.x - p.prev_pos.x
+            vy = p.pos.y - p.prev_pos.y
+            if vx*vx + vy*vy > limit_sq: continue
+        top = min(top, p.pos.y - p.radius)
+    return solver.height - top
+
+def sample(solver, step, dt, elapsed, settle_speed=SETTLE_SPEED, fresh=()):
+    diag = solver.diagnostics
+    sub_dt = dt / max(diag.sub_steps, 1)
+    return {
+        "step": step,
+        "time": step * dt,
+        "particles": len(solver.particles),
+        "settled_height": settled_height(solver, sub_dt, settle_speed, fresh),
+        "kinetic_energy": diag.kinetic_energy,
+        "max_penetration": diag.max_penetration,
+        "invalid": diag.invalid_count,
+        "sub_steps": diag.sub_steps,
+        "steps_per_sec": step / elapsed if elapsed > 0 else 0.0,
+    }
+
+def peak_rss_mb():
+    if resource is None: return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def config_hash(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+def run_job(config, on_sample=None):
+    name = config["name"]
+    steps = config.get("steps", 600)
+    dt = config.get("dt", 1/120)
+    sample_every = config.get("sample_every", 30)
+    time_limit = config.get("time_limit")
+    memory_mb = config.get("memory_mb")
+    settle_speed = config.get("settle_speed", SETTLE_SPEED)
+    spawned_at = {}
+
+    result = {"name": name, "status": "ok", "error": None, "samples": []}
+    start = time.perf_counter()
+    try:
+        solver = build_solver(config)
+        for step in range(1, steps + 1):
+            for p in spawn_scene(solver, config, step - 1):
+                spawned_at[id(p)] = step
+            solver.update(dt)
+            elapsed = time.perf_counter() - start
+            if step % sample_every == 0 or step == steps:
+                spawned_at = {k: v for k, v in spawned_at.items() if step - v < SETTLE_FRAMES}
+                s = sample(solver, step, dt, elapsed, settle_speed, spawned_at)
+                result["samples"].append(s)
+                if on_sample is not None:
+                    on_sample(s)
+            if time_limit and elapsed > time_limit:
+                result["status"] = "timeout"
+                break
+            if memory_mb and (peak_rss_mb() or 0) > memory_mb:
+                result["status"] = "memory"
+                break
+    except MemoryError:
+        result["status"] = "memory"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+
+    result["elapsed"] = time.perf_counter() - start
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def address_space_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def limit_memory(memory_mb):
+    # 프레임 하나가 메모리를 다 먹는 경우까지 막도록 주소 공간을 제한한다.
+    # 이미 매핑된 라이브러리/스레드 스택 위에 memory_mb 만큼 여유를 준다.
+    # 지원하지 않는 플랫폼에서는 run_job 의 프레임 사이 RSS 검사만 남는다.
+    if resource is None or not hasattr(resource, "RLIMIT_AS"): return
+    current = address_space_mb()
+    if current is None: return
+    limit = int((current + memory_mb) * 1024 * 1024)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+def _worker(config, conn):
+    if config.get("memory_mb"):
+        limit_memory(config["memory_mb"])
+    conn.send(("result", run_job(config, lambda s: conn.send(("sample", s)))))
+    conn.close()
+
+def _start_job(ctx, config):
+    # 작업마다 프로세스와 파이프를 따로 둔다. 강제 종료된 작업이 다른 작업과 공유하는
+    # 큐의 락을 쥔 채로 죽는 일이 없고, 종료 코드로 크래시/OOM 을 구분할 수 있다.
+    conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_worker, args=(config, child_conn), daemon=True)
+    proc.start()
+    child_conn.close()
+    start = time.perf_counter()
+    time_limit = config.get("time_limit")
+    return {"config": config, "process": proc, "conn": conn, "start": start, "samples": [],
+            "deadline": start + time_limit + KILL_GRACE if time_limit else None}
+
+def _lost_result(job, status, error):
+    return {"name": job["config"]["name"], "status": status, "error": error, "samples": job["samples"],
+            "elapsed": time.perf_counter() - job["start"], "peak_rss_mb": None}
+
+def _poll_job(job, on_progress):
+    proc, conn = job["process"], job["conn"]
+    # 먼저 생존 여부를 본 뒤 파이프를 비워야, 결과를 보내고 막 종료한 작업을 크래시로 오인하지 않는다
+    alive = proc.is_alive()
+    try:
+        while conn.poll():
+            kind, data = conn.recv()
+            if kind == "result":
+                return data
+            job["samples"].append(data)
+            if on_progress is not None: on_progress(job["config"]["name"], data)
+    except (EOFError, OSError):
+        pass
+
+    if not alive:
+        proc.join()
+        status = "memory" if proc.exitcode == -SIGKILL else "crashed"
+        return _lost_result(job, status, "worker exited with code {}".format(proc.exitcode))
+    if job["deadline"] is not None and time.perf_counter() > job["deadline"]:
+        proc.kill()
+        proc.join()
+        return _lost_result(job, "timeout", "killed after {:.1f}s".format(time.perf_counter() - job["start"]))
+    return None
+
+def load_journal(path):
+    results = {}
+    if not os.path.exists(path): return results
+    with open(path) as f:
+        for line in f:
+            try:
+                r = json.loads(line)
+            except ValueError:
+                # 중단 시점에 잘린 마지막 줄
+                continue
+            results[r["name"]] = r
+    return results
+
+def write_columns(path, configs, results):
+    param_keys = sorted({k for c in configs for k in c.get("params", {})})
+    columns = {k: [] for k in ["job", "status"] + ["param." + k for k in param_keys] + SAMPLE_KEYS}
+    for config in configs:
+        r = results.get(config["name"])
+        if r is None: continue
+        for s in r["samples"] or [{}]:
+            columns["job"].append(r["name"])
+            columns["status"].append(r["status"])
+            for k in param_keys:
+                columns["param." + k].append(config.get("params", {}).get(k))
+            for k in SAMPLE_KEYS:
+                columns[k].append(s.get(k))
+
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(columns, f)
+    os.replace(tmp, path)
+
+def run_batch(configs, output, workers=None, on_progress=None, on_result=None):
+    configs = [dict(c, name=c.get("name", "job{}".format(i))) for i, c in enumerate(configs)]
+    journal = output + ".journal"
+    results = load_journal(journal)
+    # 같은 이름이라도 설정이 바뀌었으면 저널의 결과를 재사용하지 않는다
+    hashes = {c["name"]: config_hash(c) for c in configs}
+    pending = [c for c in configs if results.get(c["name"], {}).get("config_hash") != hashes[c["name"]]]
+
+    if pending:
+        ctx = mp.get_context()
+        workers = workers or os.cpu_count() or 1
+        running = []
+        try:
+            with open(journal, "a") as log:
+                while pending or running:
+                    while pending and len(running) < workers:
+                        running.append(_start_job(ctx, pending.pop(0)))
+                    wait([job["conn"] for job in running], timeout=0.1)
+                    for job in list(running):
+                        r = _poll_job(job, on_progress)
+                        if r is None: continue
+                        running.remove(job)
+                        job["process"].join()
+                        job["conn"].close()
+                        r["config_hash"] = hashes[r["name"]]
+                        results[r["name"]] = r
+                        log.write(json.dumps(r) + "\n")
+                        log.flush()
+                        os.fsync(log.fileno())
+                        if on_result is not None: on_result(r)
+        finally:
+            for job in running:
+                job["process"].kill()
+                job["process"].join()
+
+    write_columns(output, configs, results)
+    return results
@@ -1,7 +1,6 @@
 import pygame
 import math
 from components.obstacle import CircleObstacle, RectObstacle
-from components.vector import Vector2D
 
 class InputHandler:
     def __init__(self, solver):
@@ -23,13 +22,11 @@ class InputHandler:
         if keys[pygame.K_x]: self.obs_type = "rect"
 
         if keys[pygame.K_g]:
-            self.solver.attractor_pos = Vector2D(mx, my)
-            self.solver.attractor_force = 250000.0
+            self.solver.set_attractor(mx, my, 250000.0)
         elif keys[pygame.K_f]:
-            self.solver.attractor_pos = Vector2D(mx, my)
-            self.solver.attractor_force = -250000.0
+            self.solver.set_attractor(mx, my, -250000.0)
         else:
-            self.solver.attractor_pos = None
+            self.solver.clear_attractor()
 
         if buttons[0]:
             cols, rows = 3, 3
@@ -53,8 +50,10 @@ class InputHandler:
     def handle_event(self, event):
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_r: 
-                self.solver.particles = []
-                self.solver.obstacles = []
+                self.solver.reset()
             
             elif event.key == pygame.K_o: 
-                self.solver.use_optimization = not self.solver.use_optimization
\ No newline at end of file
+                self.solver.use_optimization = not self.solver.use_optimization
+
+            elif event.key == pygame.K_b:
+                self.solver.backend = "numba" if self.solver.backend == "python" else "python"
\ No newline at end of file
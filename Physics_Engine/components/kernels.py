@@ -0,0 +1,443 @@
+import math
+import numpy as np
+from numba import njit
+
+# components.particle.TYPE_CODES 와 같은 번호
+WATER, SAND, STONE, FIRE, SMOKE, STEAM = 0, 1, 2, 3, 4, 5
+CIRCLE, RECT = 0, 1
+MAX_VEL = 1500.0
+
+# 배열을 인자로 받는 njit 함수 호출은 매번 참조 카운트 비용이 붙으므로
+# 입자/쌍 단위로 도는 루프는 함수 안에 직접 풀어 쓴다.
+
+@njit(cache=True)
+def is_gas(t):
+    return t == FIRE or t == SMOKE or t == STEAM
+
+@njit(cache=True)
+def ignite(i, burning, burn, max_burn, sleeping, sleep_t):
+    burning[i] = True
+    burn[i] = 2.0 + np.random.uniform(0.0, 1.0)
+    max_burn[i] = burn[i]
+    sleeping[i] = False
+    sleep_t[i] = 0.0
+
+@njit(cache=True)
+def apply_forces(px, py, ax, ay, mass, ptype, static, sleeping, sleep_t, invalid,
+                 gravity, attractor, tx, ty, force):
+    n = px.shape[0]
+    for i in range(n):
+        if invalid[i] or static[i] or sleeping[i]: continue
+        if is_gas(ptype[i]):
+            ax[i] += np.random.uniform(-20.0, 20.0)
+        ay[i] += gravity * mass[i]
+
+    if not attractor: return
+    for i in range(n):
+        if invalid[i] or static[i]: continue
+        sleeping[i] = False
+        sleep_t[i] = 0.0
+        dx = tx - px[i]
+        dy = ty - py[i]
+        dist_sq = dx*dx + dy*dy
+        if dist_sq > 100:
+            dist = math.sqrt(dist_sq)
+            f = force / dist
+            ax[i] += (dx/dist) * f
+            ay[i] += (dy/dist) * f
+
+@njit(cache=True)
+def apply_bounds(px, py, ox, oy, radius, ptype, static, sleeping, invalid, width, height, floor_friction):
+    for i in range(px.shape[0]):
+        if invalid[i] or static[i] or sleeping[i]: continue
+        r = radius[i]
+        if py[i] > height - r:
+            py[i] = height - r
+            f = floor_friction if ptype[i] == SAND or ptype[i] == STONE else 0.05
+            ox[i] += (px[i] - ox[i]) * f
+            oy[i] = py[i]
+        if px[i] < r:
+            px[i] = r
+            ox[i] = px[i]
+        elif px[i] > width - r:
+            px[i] = width - r
+            ox[i] = px[i]
+
+@njit(cache=True)
+def cell_coord(v, cell_size, lo, hi):
+    # SpatialGrid.get_key 와 같은 int() 절삭, 범위 밖은 가장자리 셀로
+    c = v / cell_size
+    if c < lo: return lo
+    if c > hi: return hi
+    return int(c)
+
+@njit(cache=True)
+def build_grid(px, py, invalid, use_grid, cell_size, lo_x, hi_x, lo_y, hi_y):
+    # 입자가 있는 영역만 덮는 격자를 counting sort 로 만든다.
+    # 전수 검사 모드는 모든 입자가 들어있는 셀 하나짜리 격자로 처리
+    n = px.shape[0]
+    cx = np.zeros(n, np.int64)
+    cy = np.zeros(n, np.int64)
+    min_x, max_x, min_y, max_y = 0, 0, 0, 0
+    if use_grid:
+        min_x, max_x, min_y, max_y = hi_x, lo_x, hi_y, lo_y
+        for i in range(n):
+            if invalid[i]: continue
+            cx[i] = cell_coord(px[i], cell_size, lo_x, hi_x)
+            cy[i] = cell_coord(py[i], cell_size, lo_y, hi_y)
+            min_x = min(min_x, cx[i])
+            max_x = max(max_x, cx[i])
+            min_y = min(min_y, cy[i])
+            max_y = max(max_y, cy[i])
+        if min_x > max_x:
+            min_x, max_x, min_y, max_y = 0, 0, 0, 0
+
+    cols = max_x - min_x + 1
+    rows = max_y - min_y + 1
+    cell_of = np.empty(n, np.int64)
+    start = np.zeros(cols * rows + 1, np.int64)
+    for i in range(n):
+        if invalid[i]:
+            cell_of[i] = -1
+            continue
+        c = (cy[i] - min_y) * cols + (cx[i] - min_x)
+        cell_of[i] = c
+        start[c + 1] += 1
+    for c in range(cols * rows):
+        start[c + 1] += start[c]
+
+    # 인덱스 순서대로 채워서 셀 안의 순서가 Python 그리드와 같도록
+    fill = start.copy()
+    items = np.empty(n, np.int64)
+    for i in range(n):
+        c = cell_of[i]
+        if c < 0: continue
+        items[fill[c]] = i
+        fill[c] += 1
+    return start, items, min_x, min_y, cols, rows
+
+@njit(cache=True)
+def solve_obstacles(px, py, ox, oy, radius, ptype, sleeping, invalid, obs_kind, obs_x, obs_y, obs_a, obs_b,
+                    obstacle_friction, water_friction):
+    # CircleObstacle / RectObstacle.resolve_collision
+    max_pen = 0.0
+    for i in range(px.shape[0]):
+        if invalid[i] or sleeping[i]: continue
+        friction = water_friction if ptype[i] == WATER else obstacle_friction
+        for k in range(obs_kind.shape[0]):
+            depth = 0.0
+            if obs_kind[k] == CIRCLE:
+                dx = px[i] - obs_x[k]
+                dy = py[i] - obs_y[k]
+                dist_sq = dx*dx + dy*dy
+                min_dist = obs_a[k] + radius[i]
+                if dist_sq < min_dist * min_dist:
+                    dist = math.sqrt(dist_sq)
+                    if dist == 0: continue
+                    n_x, n_y = dx / dist, dy / dist
+                    depth = min_dist - dist
+                    px[i] += n_x * depth
+                    py[i] += n_y * depth
+                    ox[i] += (px[i] - ox[i]) * friction * 0.1
+                    oy[i] += (py[i] - oy[i]) * friction * 0.1
+            else:
+                left = obs_x[k] - obs_a[k]/2 - radius[i]
+                right = obs_x[k] + obs_a[k]/2 + radius[i]
+                top = obs_y[k] - obs_b[k]/2 - radius[i]
+                bottom = obs_y[k] + obs_b[k]/2 + radius[i]
+                if left < px[i] < right and top < py[i] < bottom:
+                    dl = px[i] - left
+                    dr = right - px[i]
+                    dt = py[i] - top
+                    db = bottom - py[i]
+                    depth = min(dl, dr, dt, db)
+                    if depth == dl: px[i] = left
+                    elif depth == dr: px[i] = right
+                    elif depth == dt: py[i] = top
+                    elif depth == db: py[i] = bottom
+                    ox[i] += (px[i] - ox[i]) * friction * 0.1
+                    oy[i] += (py[i] - oy[i]) * friction * 0.1
+            if depth / (2 * radius[i]) > max_pen: max_pen = depth / (2 * radius[i])
+    return max_pen
+
+@njit(cache=True)
+def react(i, j, ptype, radius, mass, friction, decay, life, burning, burn, max_burn,
+          sleeping, sleep_t, props):
+    # Solver.resolve_interaction 과 같은 규칙, True 면 물리 충돌은 건너뜀
+    t1, t2 = ptype[i], ptype[j]
+    if (t1 == WATER and t2 == FIRE) or (t1 == FIRE and t2 == WATER):
+        fire = i if t1 == FIRE else j
+        water = i if t1 == WATER else j
+        life[fire] = 0.0
+        if np.random.random() < 0.2:
+            ptype[water] = STEAM
+            radius[water] = props[STEAM, 0]
+            mass[water] = props[STEAM, 1]
+            friction[water] = props[STEAM, 2]
+            decay[water] = props[STEAM, 3]
+            sleeping[water] = False
+            sleep_t[water] = 0.0
+        return True
+    if (t1 == SAND and t2 == FIRE) or (t1 == FIRE and t2 == SAND):
+        sand = i if t1 == SAND else j
+        fire = i if t1 == FIRE else j
+        if not burning[sand]:
+            ignite(sand, burning, burn, max_burn, sleeping, sleep_t)
+        life[fire] = 0.0
+        return True
+    if t1 == SAND and t2 == SAND:
+        if burning[i] and not burning[j]:
+            if np.random.random() < 0.005:
+                ignite(j, burning, burn, max_burn, sleeping, sleep_t)
+        elif burning[j] and not burning[i]:
+            if np.random.random() < 0.005:
+                ignite(i, burning, burn, max_burn, sleeping, sleep_t)
+    return False
+
+@njit(cache=True)
+def solve_pairs(px, py, ox, oy, radius, mass, friction, decay, life, ptype, static, sleeping,
+                sleep_t, burning, burn, max_burn, invalid, props, start, items, gx, gy, cols, rows,
+                use_grid, cell_size, lo_x, hi_x, lo_y, hi_y, response_coef, friction_coef):
+    # Solver.check_collision 을 get_potential_collisions 와 같은 3x3 셀 순서로
+    max_pen = 0.0
+    for i in range(px.shape[0]):
+        if invalid[i]: continue
+        cx, cy = 0, 0
+        if use_grid:
+            cx = cell_coord(px[i], cell_size, lo_x, hi_x) - gx
+            cy = cell_coord(py[i], cell_size, lo_y, hi_y) - gy
+        for di in range(-1, 2):
+            x = cx + di
+            if x < 0 or x >= cols: continue
+            for dj in range(-1, 2):
+                y = cy + dj
+                if y < 0 or y >= rows: continue
+                c = y * cols + x
+                for k in range(start[c], start[c + 1]):
+                    j = items[k]
+                    if i >= j: continue
+                    if sleeping[i] and sleeping[j]: continue
+                    if static[i] and static[j]: continue
+
+                    t1, t2 = ptype[i], ptype[j]
+                    if t1 == FIRE or t2 == FIRE or (t1 == SAND and t2 == SAND and burning[i] != burning[j]):
+                        if react(i, j, ptype, radius, mass, friction, decay, life, burning, burn,
+                                 max_burn, sleeping, sleep_t, props):
+                            continue
+                        t1, t2 = ptype[i], ptype[j]
+
+                    g1 = is_gas(t1)
+                    g2 = is_gas(t2)
+                    if g1 and g2: continue
+
+                    dx = px[i] - px[j]
+                    dy = py[i] - py[j]
+                    dist_sq = dx*dx + dy*dy
+                    min_dist = radius[i] + radius[j]
+                    if not (dist_sq < min_dist * min_dist and dist_sq > 0.0001): continue
+
+                    dist = math.sqrt(dist_sq)
+                    n_x, n_y = dx/dist, dy/dist
+                    delta = min_dist - dist
+                    if delta / min_dist > max_pen: max_pen = delta / min_dist
+
+                    if sleeping[i]:
+                        sleeping[i] = False
+                        sleep_t[i] = 0.0
+                    if sleeping[j]:
+                        sleeping[j] = False
+                        sleep_t[j] = 0.0
+
+                    w1 = 0.0 if static[i] else 1/mass[i]
+                    w2 = 0.0 if static[j] else 1/mass[j]
+                    total_w = w1 + w2
+                    if total_w == 0: continue
+
+                    r1 = w1 / total_w
+                    r2 = w2 / total_w
+                    if g1: r1, r2 = 1.0, 0.0
+                    elif g2: r1, r2 = 0.0, 1.0
+
+                    move_x = n_x * delta * response_coef
+                    move_y = n_y * delta * response_coef
+                    if not static[i]:
+                        px[i] += move_x * r1
+                        py[i] += move_y * r1
+                    if not static[j]:
+                        px[j] -= move_x * r2
+                        py[j] -= move_y * r2
+
+                    if not g1 and not g2:
+                        fr = (friction[i] + friction[j]) * 0.5
+                        tx, ty = -n_y, n_x
+                        vt1 = (px[i] - ox[i]) * tx + (py[i] - oy[i]) * ty
+                        vt2 = (px[j] - ox[j]) * tx + (py[j] - oy[j]) * ty
+                        f_strength = fr * friction_coef
+                        if not static[i]:
+                            ox[i] += tx * vt1 * f_strength
+                            oy[i] += ty * vt1 * f_strength
+                        if not static[j]:
+                            ox[j] += tx * vt2 * f_strength
+                            oy[j] += ty * vt2 * f_strength
+    return max_pen
+
+@njit(cache=True)
+def sweep_obstacle(k, r, sx, sy, ex, ey, obs_kind, obs_x, obs_y, obs_a, obs_b):
+    # CircleObstacle.sweep / RectObstacle.sweep, t < 0 이면 충돌 없음
+    dx = ex - sx
+    dy = ey - sy
+    if obs_kind[k] == CIRCLE:
+        fx = sx - obs_x[k]
+        fy = sy - obs_y[k]
+        min_dist = obs_a[k] + r
+        a = dx*dx + dy*dy
+        c = fx*fx + fy*fy - min_dist * min_dist
+        if a == 0: return -1.0, 0.0, 0.0
+        b = 2 * (fx*dx + fy*dy)
+        if c <= 0:
+            dist = math.sqrt(fx*fx + fy*fy)
+            if b >= 0 or dist == 0: return -1.0, 0.0, 0.0
+            return 0.0, fx / dist, fy / dist
+        disc = b*b - 4*a*c
+        if disc < 0: return -1.0, 0.0, 0.0
+        t = (-b - math.sqrt(disc)) / (2*a)
+        if not (0 <= t <= 1): return -1.0, 0.0, 0.0
+        return t, (fx + dx*t) / min_dist, (fy + dy*t) / min_dist
+
+    left = obs_x[k] - obs_a[k]/2 - r
+    right = obs_x[k] + obs_a[k]/2 + r
+    top = obs_y[k] - obs_b[k]/2 - r
+    bottom = obs_y[k] + obs_b[k]/2 + r
+    if left <= sx <= right and top <= sy <= bottom:
+        m = min(sx - left, right - sx, sy - top, bottom - sy)
+        if m == sx - left: n_x, n_y = -1.0, 0.0
+        elif m == right - sx: n_x, n_y = 1.0, 0.0
+        elif m == sy - top: n_x, n_y = 0.0, -1.0
+        else: n_x, n_y = 0.0, 1.0
+        if dx * n_x + dy * n_y >= 0: return -1.0, 0.0, 0.0
+        return 0.0, n_x, n_y
+
+    t_enter, t_exit = 0.0, 1.0
+    n_x, n_y = 0.0, 0.0
+    for axis in range(2):
+        s = sx if axis == 0 else sy
+        d = dx if axis == 0 else dy
+        lo = left if axis == 0 else top
+        hi = right if axis == 0 else bottom
+        if d == 0:
+            if not (lo < s < hi): return -1.0, 0.0, 0.0
+            continue
+        t0 = (lo - s) / d
+        t1 = (hi - s) / d
+        sign = -1.0
+        if t0 > t1:
+            t0, t1 = t1, t0
+            sign = 1.0
+        if t0 > t_enter:
+            t_enter = t0
+            if axis == 0: n_x, n_y = sign, 0.0
+            else: n_x, n_y = 0.0, sign
+        t_exit = min(t_exit, t1)
+        if t_enter > t_exit: return -1.0, 0.0, 0.0
+
+    if n_x == 0 and n_y == 0: return -1.0, 0.0, 0.0
+    return t_enter, n_x, n_y
+
+@njit(cache=True)
+def integrate(px, py, ox, oy, ax, ay, radius, mass, decay, life, ptype, static, sleeping,
+              sleep_t, burning, burn, invalid, dt, sleep_time, width, height,
+              use_ccd, ccd_threshold, obs_kind, obs_x, obs_y, obs_a, obs_b):
+    # Solver.update_positions + Particle.update_position + Solver.solve_ccd
+    energy = 0.0
+    for i in range(px.shape[0]):
+        if invalid[i]: continue
+        if (ptype[i] == SAND or ptype[i] == STONE) and not sleeping[i] and not static[i]:
+            vx = px[i] - ox[i]
+            vy = py[i] - oy[i]
+            if vx*vx + vy*vy < 0.002:
+                sleep_t[i] += dt
+                if sleep_t[i] > sleep_time:
+                    sleeping[i] = True
+                    ox[i] = px[i]
+                    oy[i] = py[i]
+            else:
+                sleep_t[i] = 0.0
+
+        vx = px[i] - ox[i]
+        vy = py[i] - oy[i]
+        speed = math.sqrt(vx*vx + vy*vy)
+        if speed > MAX_VEL * dt:
+            ratio = (MAX_VEL * dt) / speed
+            ox[i] = px[i] - vx * ratio
+            oy[i] = py[i] - vy * ratio
+            speed = MAX_VEL * dt
+        energy += 0.5 * abs(mass[i]) * speed * speed
+
+        sx, sy = px[i], py[i]
+        if not static[i] and not sleeping[i]:
+            vx = px[i] - ox[i]
+            vy = py[i] - oy[i]
+            ox[i] = px[i]
+            oy[i] = py[i]
+            damping = 0.98 if is_gas(ptype[i]) else 1.0
+            px[i] += vx * damping + ax[i] * dt * dt
+            py[i] += vy * damping + ay[i] * dt * dt
+            ax[i] = 0.0
+            ay[i] = 0.0
+            if decay[i] > 0:
+                life[i] -= decay[i]
+            if burning[i]:
+                burn[i] -= dt
+                if burn[i] <= 0:
+                    life[i] = 0.0
+
+        dx = px[i] - sx
+        dy = py[i] - sy
+        limit = radius[i] * ccd_threshold
+        if use_ccd and dx*dx + dy*dy > limit * limit:
+            hit_t, hit_nx, hit_ny = -1.0, 0.0, 0.0
+            for k in range(obs_kind.shape[0]):
+                t, n_x, n_y = sweep_obstacle(k, radius[i], sx, sy, px[i], py[i], obs_kind, obs_x, obs_y, obs_a, obs_b)
+                if t >= 0 and (hit_t < 0 or t < hit_t):
+                    hit_t, hit_nx, hit_ny = t, n_x, n_y
+            if hit_t >= 0:
+                px[i] = sx + dx * hit_t
+                py[i] = sy + dy * hit_t
+                vn = dx * hit_nx + dy * hit_ny
+                ox[i] = px[i] - (dx - vn * hit_nx)
+                oy[i] = py[i] - (dy - vn * hit_ny)
+
+        if not (math.isfinite(px[i]) and math.isfinite(py[i])):
+            invalid[i] = True
+        elif not (-1000 < px[i] < width + 1000 and -1000 < py[i] < height + 1000):
+            life[i] = 0.0
+    return energy / (dt * dt)
+
+@njit(cache=True)
+def step_frame(px, py, ox, oy, ax, ay, radius, mass, friction, decay, life, ptype, static,
+               sleeping, sleep_t, burning, burn, max_burn, invalid, props,
+               obs_kind, obs_x, obs_y, obs_a, obs_b,
+               steps, dt, width, height, gravity, attractor, tx, ty, force,
+               use_grid, cell_size, lo_x, hi_x, lo_y, hi_y,
+               response_coef, friction_coef, floor_friction, obstacle_friction, water_friction,
+               sleep_time, use_ccd, ccd_threshold):
+    energy = 0.0
+    max_pen = 0.0
+    for _ in range(steps):
+        apply_forces(px, py, ax, ay, mass, ptype, static, sleeping, sleep_t, invalid,
+                     gravity, attractor, tx, ty, force)
+        apply_bounds(px, py, ox, oy, radius, ptype, static, sleeping, invalid, width, height, floor_friction)
+
+        start, items, gx, gy, cols, rows = build_grid(px, py, invalid, use_grid, cell_size, lo_x, hi_x, lo_y, hi_y)
+        depth = solve_obstacles(px, py, ox, oy, radius, ptype, sleeping, invalid, obs_kind, obs_x, obs_y, obs_a, obs_b,
+                                obstacle_friction, water_friction)
+        max_pen = max(max_pen, depth)
+        depth = solve_pairs(px, py, ox, oy, radius, mass, friction, decay, life, ptype, static, sleeping,
+                            sleep_t, burning, burn, max_burn, invalid, props, start, items, gx, gy, cols, rows,
+                            use_grid, cell_size, lo_x, hi_x, lo_y, hi_y, response_coef, friction_coef)
+        max_pen = max(max_pen, depth)
+
+        energy = integrate(px, py, ox, oy, ax, ay, radius, mass, decay, life, ptype, static, sleeping,
+                           sleep_t, burning, burn, invalid, dt, sleep_time, width, height,
+                           use_ccd, ccd_threshold, obs_kind, obs_x, obs_y, obs_a, obs_b)
+    return energy, max_pen
@@ -11,9 +11,12 @@ class Obstacle:
     def draw(self, screen):
         pass
 
-    def resolve_collision(self, p):
+    def resolve_collision(self, p, friction):
         pass
 
+    def sweep(self, p, sx, sy, ex, ey):
+        return None
+
 class CircleObstacle(Obstacle):
     def __init__(self, x, y, radius):
         super().__init__(x, y)
@@ -23,7 +26,7 @@ class CircleObstacle(Obstacle):
         pygame.draw.circle(screen, self.color, (int(self.pos.x), int(self.pos.y)), self.radius)
         pygame.draw.circle(screen, (200, 200, 200), (int(self.pos.x), int(self.pos.y)), self.radius, 2)
 
-    def resolve_collision(self, p):
+    def resolve_collision(self, p, friction):
         dx = p.pos.x - self.pos.x
         dy = p.pos.y - self.pos.y
         dist_sq = dx*dx + dy*dy
@@ -39,9 +42,38 @@ class CircleObstacle(Obstacle):
             p.pos.x += n_x * overlap
             p.pos.y += n_y * overlap
             
-            friction = 0.1 if p.type == "water" else 0.8
             p.prev_pos.x += (p.pos.x - p.prev_pos.x) * friction * 0.1
             p.prev_pos.y += (p.pos.y - p.prev_pos.y) * friction * 0.1
+            return overlap
+
+    def sweep(self, p, sx, sy, ex, ey):
+        # (sx, sy) -> (ex, ey) 이동 경로와 반지름을 더한 원의 첫 교차 시점
+        dx = ex - sx
+        dy = ey - sy
+        fx = sx - self.pos.x
+        fy = sy - self.pos.y
+        min_dist = self.radius + p.radius
+
+        a = dx*dx + dy*dy
+        c = fx*fx + fy*fy - min_dist * min_dist
+        if a == 0: return None
+
+        b = 2 * (fx*dx + fy*dy)
+        if c <= 0:
+            # resolve_collision 이 접촉 거리에 딱 맞춰 둔 입자가 안쪽으로 움직이면 바로 충돌
+            dist = math.sqrt(fx*fx + fy*fy)
+            if b >= 0 or dist == 0: return None
+            return 0.0, fx / dist, fy / dist
+
+        disc = b*b - 4*a*c
+        if disc < 0: return None
+
+        t = (-b - math.sqrt(disc)) / (2*a)
+        if not (0 <= t <= 1): return None
+
+        n_x = (fx + dx*t) / min_dist
+        n_y = (fy + dy*t) / min_dist
+        return t, n_x, n_y
 
 class RectObstacle(Obstacle):
     def __init__(self, x, y, w, h):
@@ -54,7 +86,7 @@ class RectObstacle(Obstacle):
         pygame.draw.rect(screen, self.color, rect)
         pygame.draw.rect(screen, (200, 200, 200), rect, 2)
 
-    def resolve_collision(self, p):
+    def resolve_collision(self, p, friction):
         left = self.pos.x - self.w/2 - p.radius
         right = self.pos.x + self.w/2 + p.radius
         top = self.pos.y - self.h/2 - p.radius
@@ -73,6 +105,44 @@ class RectObstacle(Obstacle):
             elif m == dt: p.pos.y = top
             elif m == db: p.pos.y = bottom
             
-            friction = 0.1 if p.type == "water" else 0.8
             p.prev_pos.x += (p.pos.x - p.prev_pos.x) * friction * 0.1
-            p.prev_pos.y += (p.pos.y - p.prev_pos.y) * friction * 0.1
\ No newline at end of file
+            p.prev_pos.y += (p.pos.y - p.prev_pos.y) * friction * 0.1
+            return m
+
+    def sweep(self, p, sx, sy, ex, ey):
+        # 반지름만큼 확장한 사각형에 대한 slab 검사
+        left = self.pos.x - self.w/2 - p.radius
+        right = self.pos.x + self.w/2 + p.radius
+        top = self.pos.y - self.h/2 - p.radius
+        bottom = self.pos.y + self.h/2 + p.radius
+
+        if left <= sx <= right and top <= sy <= bottom:
+            # 면 위(또는 안)에서 출발하면 가장 가까운 면 기준으로 안쪽으로 움직일 때만 바로 충돌
+            m = min(sx - left, right - sx, sy - top, bottom - sy)
+            if m == sx - left: n_x, n_y = -1.0, 0.0
+            elif m == right - sx: n_x, n_y = 1.0, 0.0
+            elif m == sy - top: n_x, n_y = 0.0, -1.0
+            else: n_x, n_y = 0.0, 1.0
+            if (ex - sx) * n_x + (ey - sy) * n_y >= 0: return None
+            return 0.0, n_x, n_y
+
+        t_enter, t_exit = 0.0, 1.0
+        n_x, n_y = 0.0, 0.0
+        for s, d, lo, hi, axis in ((sx, ex - sx, left, right, 0), (sy, ey - sy, top, bottom, 1)):
+            if d == 0:
+                if not (lo < s < hi): return None
+                continue
+            t0 = (lo - s) / d
+            t1 = (hi - s) / d
+            sign = -1.0
+            if t0 > t1:
+                t0, t1 = t1, t0
+                sign = 1.0
+            if t0 > t_enter:
+                t_enter = t0
+                n_x, n_y = (sign, 0.0) if axis == 0 else (0.0, sign)
+            t_exit = min(t_exit, t1)
+            if t_enter > t_exit: return None
+
+        if n_x == 0 and n_y == 0: return None
+        return t_enter, n_x, n_y
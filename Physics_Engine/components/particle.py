@@ -1,5 +1,18 @@
 from components.vector import Vector2D
 
+TYPE_CODES = {"water": 0, "sand": 1, "stone": 2, "fire": 3, "smoke": 4, "steam": 5}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+TYPE_PROPERTIES = {
+    "water": {"radius": 3.0, "mass": 1.0, "friction": 0.0, "decay": 0.0, "color": (30, 100, 250)},
+    "sand": {"radius": 4.0, "mass": 2.0, "friction": 1.0, "decay": 0.0, "color": (230, 190, 60)},
+    "stone": {"radius": 6.0, "mass": 8.0, "friction": 0.9, "decay": 0.0, "color": (100, 100, 100)},
+    "fire": {"radius": 4.0, "mass": -0.8, "friction": 0.1, "decay": 0.015, "color": (255, 80, 10)},
+    "smoke": {"radius": 5.5, "mass": -0.05, "friction": 0.1, "decay": 0.01, "color": (150, 150, 150)},
+    "steam": {"radius": 5.0, "mass": -0.8, "friction": 0.1, "decay": 0.005, "color": (200, 240, 255)},
+}
+MAX_RADIUS = max(props["radius"] for props in TYPE_PROPERTIES.values())
+
 class Particle:
     def __init__(self, x, y, p_type="water", is_static=False):
         self.pos = Vector2D(x, y)
@@ -26,44 +39,13 @@ class Particle:
         self.set_type_properties(p_type)
 
     def set_type_properties(self, p_type):
-        if p_type == "water":
-            self.radius = 3.0
-            self.mass = 1.0
-            self.friction = 0.0
-            self.color = (30, 100, 250)
-            
-        elif p_type == "sand":
-            self.radius = 4.0
-            self.mass = 2.0
-            self.friction = 1.0
-            self.color = (230, 190, 60)
-            
-        elif p_type == "stone":
-            self.radius = 6.0
-            self.mass = 8.0
-            self.friction = 0.9
-            self.color = (100, 100, 100)
-            
-        elif p_type == "fire":
-            self.radius = 4.0
-            self.mass = -0.8
-            self.friction = 0.1
-            self.decay = 0.015
-            self.color = (255, 80, 10)
-            
-        elif p_type == "smoke":
-            self.radius = 5.5
-            self.mass = -0.05
-            self.friction = 0.1
-            self.decay = 0.01
-            self.color = (150, 150, 150)
-            
-        elif p_type == "steam":
-            self.radius = 5.0
-            self.mass = -0.8
-            self.friction = 0.1
-            self.decay = 0.005
-            self.color = (200, 240, 255)
+        props = TYPE_PROPERTIES.get(p_type)
+        if props is None: return
+        self.radius = props["radius"]
+        self.mass = props["mass"]
+        self.friction = props["friction"]
+        self.decay = props["decay"]
+        self.color = props["color"]
 
     def apply_force(self, force):
         if not self.is_static and not self.is_sleeping:
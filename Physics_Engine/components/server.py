@@ -0,0 +1,300 @@
+import asyncio
+import collections
+import json
+import socket
+import struct
+from array import array
+from components.obstacle import CircleObstacle, RectObstacle
+from components.particle import TYPE_CODES
+from components.spawn import spawn_from_spec
+
+# 메시지: [종류 1바이트][길이 uint32] + payload
+# b"J" = JSON 응답, b"F" = 위치/타입 프레임
+MSG_HEADER = struct.Struct("<cI")
+FRAME_HEADER = struct.Struct("<IId")
+# 명령 한 줄의 최대 길이. 큰 mask 스폰도 한 줄로 들어온다.
+MAX_COMMAND = 1 << 22
+
+def encode_frame(particles, frame_no, sim_time):
+    pos = array("f")
+    for p in particles:
+        pos.append(p.pos.x)
+        pos.append(p.pos.y)
+    types = bytes(TYPE_CODES.get(p.type, 255) for p in particles)
+    return FRAME_HEADER.pack(frame_no, len(particles), sim_time) + pos.tobytes() + types
+
+def decode_frame(payload):
+    frame_no, count, sim_time = FRAME_HEADER.unpack_from(payload)
+    start = FRAME_HEADER.size
+    pos = array("f")
+    pos.frombytes(payload[start:start + count * 8])
+    types = payload[start + count * 8:start + count * 9]
+    return frame_no, sim_time, pos, types
+
+def pack_message(kind, payload):
+    return MSG_HEADER.pack(kind, len(payload)) + payload
+
+async def read_message(reader):
+    header = await reader.readexactly(MSG_HEADER.size)
+    kind, length = MSG_HEADER.unpack(header)
+    return kind, await reader.readexactly(length)
+
+class ClientSession:
+    def __init__(self, reader, writer, max_buffer=32768):
+        self.reader = reader
+        self.writer = writer
+        # 전송 중인 데이터를 작게 묶어둬야 느린 클라이언트에서 바로 프레임이 버려진다
+        writer.transport.set_write_buffer_limits(high=max_buffer)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, max_buffer)
+        self.subscribed = False
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.sender = None
+
+    def reply(self, data):
+        self.writer.write(pack_message(b"J", json.dumps(data).encode()))
+
+    def offer(self, frame):
+        # 느린 클라이언트는 아직 보내지 못한 프레임을 최신 프레임으로 덮어쓴다
+        if self.pending is not None:
+            self.frames_dropped += 1
+        self.pending = frame
+        self.ready.set()
+
+    async def send_frames(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            frame, self.pending = self.pending, None
+            if frame is None: continue
+            self.writer.write(pack_message(b"F", frame))
+            await self.writer.drain()
+            self.frames_sent += 1
+
+class SimulationServer:
+    def __init__(self, solver, dt=1/120, frame_rate=30.0, max_buffer=32768, max_command=MAX_COMMAND):
+        self.solver = solver
+        self.dt = dt
+        self.frame_rate = frame_rate
+        self.max_buffer = max_buffer
+        self.max_command = max_command
+        self.paused = False
+        # 스텝은 작업 스레드에서 돌리므로 solver 를 바꾸는 명령과 스텝이 겹치지 않게 한다
+        self.solver_lock = asyncio.Lock()
+
+        self.sim_time = 0.0
+        self.steps = 0
+        self.frame_no = 0
+        self.sessions = set()
+        self.handlers = set()
+        self.server = None
+        self.tasks = []
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_client, path=path, limit=self.max_command)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host, port, limit=self.max_command)
+        self.tasks = [asyncio.create_task(self.run_simulation()),
+                      asyncio.create_task(self.run_broadcast())]
+        return self.server
+
+    @property
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        for session in list(self.sessions):
+            session.writer.close()
+        for handler in self.handlers:
+            handler.cancel()
+        if self.handlers:
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def step(self, n=1):
+        for _ in range(n):
+            self.solver.update(self.dt)
+            self.sim_time += self.dt
+            self.steps += 1
+
+    async def step_async(self):
+        # solver.update 는 CPU 를 오래 쓰므로 이벤트 루프 밖에서 돌려야 방송 주기가 유지된다
+        async with self.solver_lock:
+            await asyncio.get_running_loop().run_in_executor(None, self.step)
+
+    async def run_simulation(self):
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while True:
+            if not self.paused:
+                await self.step_async()
+            next_time = max(next_time + self.dt, loop.time())
+            await asyncio.sleep(next_time - loop.time())
+
+    async def run_broadcast(self):
+        # 인코딩/전송 시간만큼 주기가 밀리지 않도록 절대 시각 기준으로 잔다
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while True:
+            next_time = max(next_time + 1.0 / self.frame_rate, loop.time())
+            await asyncio.sleep(next_time - loop.time())
+            subscribers = [s for s in self.sessions if s.subscribed]
+            if not subscribers: continue
+            # 프레임은 한 번만 인코딩해서 모든 구독자가 공유
+            frame = encode_frame(self.solver.particles, self.frame_no, self.sim_time)
+            self.frame_no += 1
+            for session in subscribers:
+                session.offer(frame)
+
+    async def handle_client(self, reader, writer):
+        session = ClientSession(reader, writer, self.max_buffer)
+        session.sender = asyncio.create_task(session.send_frames())
+        self.sessions.add(session)
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # 한도를 넘은 줄은 이미 일부가 버려져 이후 스트림을 믿을 수 없으므로 연결을 끊는다
+                    session.reply({"ok": False, "error": "command longer than {} bytes".format(self.max_command)})
+                    break
+                if not line: break
+                try:
+                    data = json.loads(line)
+                    result = await self.execute(session, data)
+                    session.reply(dict(ok=True, **result))
+                except Exception as e:
+                    session.reply({"ok": False, "error": "{}: {}".format(type(e).__name__, e)})
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.sessions.discard(session)
+            self.handlers.discard(asyncio.current_task())
+            session.sender.cancel()
+            writer.close()
+
+    async def execute(self, session, data):
+        cmd = data["cmd"]
+        if cmd == "step":
+            for _ in range(int(data.get("n", 1))):
+                if session.writer.is_closing(): break
+                await self.step_async()
+            return {"steps": self.steps}
+        async with self.solver_lock:
+            return self.apply(session, cmd, data)
+
+    def apply(self, session, cmd, data):
+        solver = self.solver
+
+        if cmd == "spawn":
+            return {"spawned": len(spawn_from_spec(solver, data)), "steps": self.steps}
+        elif cmd == "obstacle":
+            shape = data.get("shape", "circle")
+            if shape == "circle":
+                solver.add_obstacle(CircleObstacle(data["x"], data["y"], data.get("radius", 30)))
+            elif shape == "rect":
+                solver.add_obstacle(RectObstacle(data["x"], data["y"], data.get("w", 60), data.get("h", 30)))
+            else:
+                raise ValueError("unknown obstacle shape: {}".format(shape))
+        elif cmd == "attractor":
+            if data.get("x") is None:
+                solver.clear_attractor()
+            else:
+                solver.set_attractor(data["x"], data["y"], data.get("force", 250000.0))
+        elif cmd == "reset":
+            solver.reset()
+        elif cmd == "pause":
+            self.paused = True
+        elif cmd == "resume":
+            self.paused = False
+        elif cmd == "subscribe":
+            session.subscribed = True
+        elif cmd == "unsubscribe":
+            session.subscribed = False
+        elif cmd == "stats":
+            return {"particles": len(solver.particles), "steps": self.steps,
+                    "sim_time": self.sim_time, "frame_no": self.frame_no, "clients": len(self.sessions),
+                    "kinetic_energy": solver.diagnostics.kinetic_energy,
+                    "max_penetration": solver.diagnostics.max_penetration,
+                    "frames_sent": session.frames_sent, "frames_dropped": session.frames_dropped}
+        else:
+            raise ValueError("unknown command: {}".format(cmd))
+        return {"steps": self.steps}
+
+class SimulationClient:
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        # 응답을 기다리는 command() 들. 응답은 보낸 순서대로 온다.
+        self.waiting = collections.deque()
+        self.closed = False
+        # 프레임은 가장 최근 것 하나만 보관, 응답은 프레임 때문에 기다리지 않는다
+        self.frame = None
+        self.frame_ready = asyncio.Event()
+        self.frames_skipped = 0
+        self.receiver = None
+
+    async def connect(self, host="127.0.0.1", port=0, path=None):
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.receiver = asyncio.create_task(self.receive())
+
+    async def receive(self):
+        try:
+            while True:
+                kind, payload = await read_message(self.reader)
+                if kind == b"J":
+                    future = self.waiting.popleft() if self.waiting else None
+                    if future is not None and not future.done():
+                        future.set_result(json.loads(payload))
+                elif kind == b"F":
+                    if self.frame is not None:
+                        self.frames_skipped += 1
+                    self.frame = payload
+                    self.frame_ready.set()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            # 서버가 연결을 끊으면 기다리던 명령과 next_frame() 이 영원히 멈추지 않게 깨운다
+            self.closed = True
+            while self.waiting:
+                future = self.waiting.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError("connection closed by server"))
+            self.frame_ready.set()
+
+    async def command(self, cmd, **args):
+        if self.closed:
+            raise ConnectionError("connection closed by server")
+        args["cmd"] = cmd
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.append(future)
+        self.writer.write(json.dumps(args).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def next_frame(self):
+        if self.frame is None and not self.closed:
+            await self.frame_ready.wait()
+        self.frame_ready.clear()
+        frame, self.frame = self.frame, None
+        if frame is None:
+            raise ConnectionError("connection closed by server")
+        return decode_frame(frame)
+
+    async def close(self):
+        if self.receiver is not None:
+            self.receiver.cancel()
+        self.writer.close()
@@ -1,11 +1,15 @@
 import math
 import random
+from collections import deque
+from components.backend import create_backend
+from components import spawn
 from components.grid import SpatialGrid
-from components.particle import Particle
+from components.particle import Particle, TYPE_PROPERTIES, MAX_RADIUS
+from components.stability import StepDiagnostics, StabilityPolicy
 from components.vector import Vector2D
 
 class Solver:
-    def __init__(self, width, height):
+    def __init__(self, width, height, cell_size=12.0):
         self.width = width
         self.height = height
         self.gravity = 1500.0
@@ -13,25 +17,105 @@ class Solver:
         self.particles = []
         self.obstacles = []
         self.sub_steps = 8
-        self.grid = SpatialGrid(width, height, cell_size=12.0)
+        self.grid = SpatialGrid(width, height, cell_size=cell_size)
         self.use_optimization = True 
+        self.backend = "python"
+        self.backends = {}
+        self.use_ccd = True
+        self.ccd_threshold = 0.5
+
+        self.response_coef = 0.3
+        self.friction_coef = 0.1
+        self.floor_friction = 0.9
+        self.obstacle_friction = 0.8
+        self.obstacle_water_friction = 0.1
+        self.sleep_time = 0.5
+
+        self.diagnostics = StepDiagnostics()
+        self.stability_policy = StabilityPolicy()
+        self.quarantine = deque(maxlen=self.stability_policy.quarantine_limit)
+        self.frame_sub_steps = 0
+        self.frame_count = 0
         
         self.attractor_pos = None
         self.attractor_force = 0
 
+    def spawn_spacing(self, p_type, spacing=None):
+        radius = TYPE_PROPERTIES[p_type]["radius"]
+        if spacing is None: spacing = radius * 2.2
+        # 격자 배치는 후보끼리 겹침 검사를 생략하므로 지름보다 촘촘하게 놓지 않는다
+        spacing = max(spacing, radius * 2)
+        # 격자 이웃끼리는 지터를 줘도 겹치지 않도록 간격의 여유분 안에서만 흔든다
+        jitter = (spacing - radius * 2) / 4
+        return spacing, jitter
+
     def spawn_region(self, x, y, p_type, cols=3, rows=3):
-        temp = Particle(0, 0, p_type)
-        spacing = temp.radius * 2.2
+        spacing, jitter = self.spawn_spacing(p_type)
         start_x = x - (cols * spacing) / 2
         start_y = y - (rows * spacing) / 2
-        for i in range(cols):
-            for j in range(rows):
-                px = start_x + i * spacing
-                py = start_y + j * spacing
-                px += random.uniform(-0.5, 0.5) 
-                py += random.uniform(-0.5, 0.5)
-                if 0 < px < self.width and 0 < py < self.height:
-                    self.add_particle(px, py, p_type)
+        points = [(start_x + i * spacing + random.uniform(-jitter, jitter),
+                   start_y + j * spacing + random.uniform(-jitter, jitter))
+                  for i in range(cols) for j in range(rows)]
+        return self.spawn_points(points, p_type, check_new=False)
+
+    def spawn_rect(self, x, y, w, h, p_type, spacing=None):
+        spacing, jitter = self.spawn_spacing(p_type, spacing)
+        return self.spawn_points(spawn.rect_points(x, y, w, h, spacing, jitter), p_type, check_new=False)
+
+    def spawn_disc(self, x, y, radius, p_type, spacing=None):
+        spacing, jitter = self.spawn_spacing(p_type, spacing)
+        return self.spawn_points(spawn.disc_points(x, y, radius, spacing, jitter), p_type, check_new=False)
+
+    def spawn_polygon(self, vertices, p_type, spacing=None):
+        spacing, jitter = self.spawn_spacing(p_type, spacing)
+        return self.spawn_points(spawn.polygon_points(vertices, spacing, jitter), p_type, check_new=False)
+
+    def spawn_mask(self, mask, x, y, p_type, scale=1.0, spacing=None):
+        spacing, jitter = self.spawn_spacing(p_type, spacing)
+        return self.spawn_points(spawn.mask_points(mask, x, y, spacing, jitter, scale), p_type, check_new=False)
+
+    def spawn_points(self, points, p_type, is_static=False, check_new=True):
+        # check_new=False 는 후보끼리는 이미 떨어져 있는 경우(격자 배치)로 기존 입자와만 비교
+        radius = TYPE_PROPERTIES[p_type]["radius"]
+        w, h = self.width, self.height
+        points = [(px, py) for px, py in points if 0 < px < w and 0 < py < h]
+        if not points: return []
+
+        # 후보 영역 근처의 기존 입자만 담은 임시 그리드로 겹침 검사
+        cell = radius + MAX_RADIUS
+        grid = SpatialGrid(w, h, cell)
+        x0 = min(p[0] for p in points) - cell
+        x1 = max(p[0] for p in points) + cell
+        y0 = min(p[1] for p in points) - cell
+        y1 = max(p[1] for p in points) + cell
+        near = []
+        for p in self.particles:
+            x, y = p.pos.x, p.pos.y
+            if x0 < x < x1 and y0 < y < y1:
+                grid.add_particle(len(near), x, y)
+                near.append((x, y, p.radius))
+
+        if near or check_new:
+            accepted = []
+            for px, py in points:
+                blocked = False
+                for j in grid.get_potential_collisions(px, py):
+                    x, y, r = near[j]
+                    min_dist = radius + r
+                    if (px - x)**2 + (py - y)**2 < min_dist * min_dist:
+                        blocked = True
+                        break
+                if blocked: continue
+                if check_new:
+                    grid.add_particle(len(near), px, py)
+                    near.append((px, py, radius))
+                accepted.append((px, py))
+            points = accepted
+
+        new = [Particle(px, py, p_type, is_static) for px, py in points]
+
+        self.particles.extend(new)
+        return new
 
     def add_particle(self, x, y, p_type, is_static=False):
         p = Particle(x, y, p_type, is_static)
@@ -40,31 +124,59 @@ class Solver:
     def add_obstacle(self, obs):
         self.obstacles.append(obs)
 
+    def set_attractor(self, x, y, force):
+        self.attractor_pos = Vector2D(x, y)
+        self.attractor_force = force
+
+    def clear_attractor(self):
+        self.attractor_pos = None
+
+    def reset(self):
+        self.particles = []
+        self.obstacles = []
+        self.quarantine = deque(maxlen=self.stability_policy.quarantine_limit)
+        self.stability_policy.reset()
+
     def update(self, dt):
         if dt == 0: return
-        self.particles = [p for p in self.particles if p.life > 0]
+        self.frame_count += 1
+        steps = max(self.frame_sub_steps, self.sub_steps)
+        self.diagnostics.reset(steps)
+
+        alive = []
+        invalid = []
+        for p in self.particles:
+            if p.life <= 0: continue
+            if math.isfinite(p.pos.x) and math.isfinite(p.pos.y): alive.append(p)
+            else: invalid.append(p)
+        self.particles = alive
+        if invalid: self.discard_invalid(invalid)
         
         for p in self.particles:
             if p.type == "sand" and p.is_burning and p.burn_timer < 0.1:
                 if random.random() < 0.3:
                     self.add_particle(p.pos.x, p.pos.y, "smoke")
 
-        sub_dt = dt / self.sub_steps
-        for _ in range(self.sub_steps):
-            self.apply_gravity()
-            self.apply_forces()
-            self.apply_bounds()
-            self.solve_collisions()
-            self.update_positions(sub_dt)
+        sub_dt = dt / steps
+        self.get_backend().step(self, sub_dt, steps)
+
+        self.frame_sub_steps = self.stability_policy.next_sub_steps(self, self.diagnostics)
+
+    def get_backend(self):
+        if self.backend not in self.backends:
+            self.backends[self.backend] = create_backend(self.backend)
+        return self.backends[self.backend]
 
     def update_positions(self, dt):
         max_vel = 1500.0
+        energy = 0.0
+        invalid = []
         for p in self.particles:
             if p.type in ["sand", "stone"] and not p.is_sleeping and not p.is_static:
                 move_sq = (p.pos.x - p.prev_pos.x)**2 + (p.pos.y - p.prev_pos.y)**2
                 if move_sq < 0.002: 
                     p.sleep_timer += dt
-                    if p.sleep_timer > 0.5: 
+                    if p.sleep_timer > self.sleep_time: 
                         p.is_sleeping = True
                         p.prev_pos.x = p.pos.x
                         p.prev_pos.y = p.pos.y
@@ -78,11 +190,51 @@ class Solver:
                 ratio = (max_vel * dt) / speed
                 p.prev_pos.x = p.pos.x - vx * ratio
                 p.prev_pos.y = p.pos.y - vy * ratio
+                speed = max_vel * dt
+            energy += 0.5 * abs(p.mass) * speed * speed
             
+            sx, sy = p.pos.x, p.pos.y
             p.update_position(dt)
-            if not (-1000 < p.pos.x < self.width + 1000 and -1000 < p.pos.y < self.height + 1000):
+            if self.use_ccd and self.obstacles:
+                self.solve_ccd(p, sx, sy)
+            if not (math.isfinite(p.pos.x) and math.isfinite(p.pos.y)):
+                invalid.append(p)
+            elif not (-1000 < p.pos.x < self.width + 1000 and -1000 < p.pos.y < self.height + 1000):
                 p.life = 0
 
+        # 프레임 간 속도(px/s) 기준 운동 에너지
+        self.diagnostics.kinetic_energy = energy / (dt * dt)
+        if invalid:
+            # NaN/inf 입자는 다음 sub-step 의 그리드/충돌 계산에 들어가기 전에 제거
+            bad = set(map(id, invalid))
+            self.particles = [p for p in self.particles if id(p) not in bad]
+            self.discard_invalid(invalid)
+
+    def discard_invalid(self, invalid):
+        self.diagnostics.invalid_count += len(invalid)
+        self.stability_policy.handle_invalid(self, invalid)
+
+    def solve_ccd(self, p, sx, sy):
+        dx = p.pos.x - sx
+        dy = p.pos.y - sy
+        limit = p.radius * self.ccd_threshold
+        if dx*dx + dy*dy <= limit * limit: return
+
+        hit = None
+        for obs in self.obstacles:
+            res = obs.sweep(p, sx, sy, p.pos.x, p.pos.y)
+            if res is not None and (hit is None or res[0] < hit[0]):
+                hit = res
+        if hit is None: return
+
+        # 충돌 시점으로 되돌리고 법선 방향 속도만 제거
+        t, n_x, n_y = hit
+        p.pos.x = sx + dx * t
+        p.pos.y = sy + dy * t
+        vn = dx * n_x + dy * n_y
+        p.prev_pos.x = p.pos.x - (dx - vn * n_x)
+        p.prev_pos.y = p.pos.y - (dy - vn * n_y)
+
     def apply_gravity(self):
         for p in self.particles:
             if p.is_static or p.is_sleeping: continue
@@ -114,7 +266,7 @@ class Solver:
             if p.is_static or p.is_sleeping: continue
             if p.pos.y > h - p.radius:
                 p.pos.y = h - p.radius
-                f = 0.9 if p.type in ["sand", "stone"] else 0.05
+                f = self.floor_friction if p.type in ["sand", "stone"] else 0.05
                 p.prev_pos.x += (p.pos.x - p.prev_pos.x) * f
                 p.prev_pos.y = p.pos.y 
             if p.pos.x < p.radius:
@@ -167,10 +319,15 @@ class Solver:
             for i, p in enumerate(self.particles):
                 self.grid.add_particle(i, p.pos.x, p.pos.y)
 
+        diag = self.diagnostics
         for p in self.particles:
             if p.is_sleeping: continue
+            friction = self.obstacle_water_friction if p.type == "water" else self.obstacle_friction
             for obs in self.obstacles:
-                obs.resolve_collision(p)
+                depth = obs.resolve_collision(p, friction)
+                # 장애물과의 겹침은 입자 지름 대비 비율로 기록한다
+                if depth and depth / (2 * p.radius) > diag.max_penetration:
+                    diag.max_penetration = depth / (2 * p.radius)
 
         count = len(self.particles)
         if not self.use_optimization:
@@ -204,6 +361,9 @@ class Solver:
             dist = math.sqrt(dist_sq)
             n_x, n_y = dx/dist, dy/dist
             delta = min_dist - dist
+            # 절대값(px)은 입자 크기와 더미 높이에 따라 달라지므로 r1 + r2 대비 비율로 기록한다
+            if delta / min_dist > self.diagnostics.max_penetration:
+                self.diagnostics.max_penetration = delta / min_dist
             
             if p1.is_sleeping: p1.wake_up()
             if p2.is_sleeping: p2.wake_up()
@@ -219,9 +379,8 @@ class Solver:
             if p1_gas: r1, r2 = 1.0, 0.0
             elif p2_gas: r1, r2 = 0.0, 1.0
 
-            response_coef = 0.3
-            move_x = n_x * delta * response_coef
-            move_y = n_y * delta * response_coef
+            move_x = n_x * delta * self.response_coef
+            move_y = n_y * delta * self.response_coef
             
             if not p1.is_static:
                 p1.pos.x += move_x * r1
@@ -239,7 +398,7 @@ class Solver:
                 v2y = p2.pos.y - p2.prev_pos.y
                 vt1 = v1x * tx + v1y * ty
                 vt2 = v2x * tx + v2y * ty
-                f_strength = friction * 0.1
+                f_strength = friction * self.friction_coef
                 if not p1.is_static:
                     p1.prev_pos.x += tx * vt1 * f_strength
                     p1.prev_pos.y += ty * vt1 * f_strength
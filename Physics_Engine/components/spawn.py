@@ -0,0 +1,69 @@
+import random
+
+# 모양별 입자 배치 후보 좌표 생성기. 겹침 검사와 추가는 Solver.spawn_points 에서 한다.
+
+def spawn_from_spec(solver, spec):
+    # 서버 명령 / 배치 설정에서 쓰는 dict 형식
+    p_type = spec.get("type", "water")
+    shape = spec.get("shape", "region")
+    if shape == "region":
+        return solver.spawn_region(spec["x"], spec["y"], p_type, spec.get("cols", 3), spec.get("rows", 3))
+    if shape == "rect":
+        return solver.spawn_rect(spec["x"], spec["y"], spec["w"], spec["h"], p_type, spec.get("spacing"))
+    if shape == "disc":
+        return solver.spawn_disc(spec["x"], spec["y"], spec["radius"], p_type, spec.get("spacing"))
+    if shape == "polygon":
+        return solver.spawn_polygon(spec["points"], p_type, spec.get("spacing"))
+    if shape == "mask":
+        return solver.spawn_mask(spec["mask"], spec["x"], spec["y"], p_type, spec.get("scale", 1.0), spec.get("spacing"))
+    raise ValueError("unknown spawn shape: {}".format(shape))
+
+def lattice(x0, y0, x1, y1, spacing, jitter):
+    # 영역 가운데에 맞춘 사각 격자
+    cols = int((x1 - x0) / spacing) + 1
+    rows = int((y1 - y0) / spacing) + 1
+    sx = x0 + ((x1 - x0) - (cols - 1) * spacing) / 2
+    sy = y0 + ((y1 - y0) - (rows - 1) * spacing) / 2
+    uniform = random.uniform
+    return [(sx + i * spacing + uniform(-jitter, jitter), sy + j * spacing + uniform(-jitter, jitter))
+            for j in range(rows) for i in range(cols)]
+
+def rect_points(x, y, w, h, spacing, jitter):
+    return lattice(x - w/2, y - h/2, x + w/2, y + h/2, spacing, jitter)
+
+def disc_points(x, y, radius, spacing, jitter):
+    r_sq = radius * radius
+    return [(px, py) for px, py in lattice(x - radius, y - radius, x + radius, y + radius, spacing, jitter)
+            if (px - x)**2 + (py - y)**2 <= r_sq]
+
+def inside_polygon(px, py, vertices):
+    inside = False
+    x1, y1 = vertices[-1]
+    for x2, y2 in vertices:
+        if (y1 > py) != (y2 > py) and px < x1 + (py - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+def polygon_points(vertices, spacing, jitter):
+    xs = [v[0] for v in vertices]
+    ys = [v[1] for v in vertices]
+    return [(px, py) for px, py in lattice(min(xs), min(ys), max(xs), max(ys), spacing, jitter)
+            if inside_polygon(px, py, vertices)]
+
+def mask_points(mask, x, y, spacing, jitter, scale=1.0):
+    # mask: pygame.mask.Mask 또는 mask[row][col] 로 읽을 수 있는 2차원 시퀀스, (x, y) 는 왼쪽 위
+    if hasattr(mask, "get_size"):
+        w, h = mask.get_size()
+        get = lambda col, row: mask.get_at((col, row))
+    else:
+        w, h = len(mask[0]), len(mask)
+        get = lambda col, row: mask[row][col]
+
+    points = []
+    for px, py in lattice(x, y, x + w * scale, y + h * scale, spacing, jitter):
+        col = int((px - x) / scale)
+        row = int((py - y) / scale)
+        if 0 <= col < w and 0 <= row < h and get(col, row):
+            points.append((px, py))
+    return points
@@ -0,0 +1,49 @@
+from collections import deque
+
+class StepDiagnostics:
+    def __init__(self):
+        self.kinetic_energy = 0.0
+        self.max_penetration = 0.0
+        self.invalid_count = 0
+        self.sub_steps = 0
+
+    def reset(self, sub_steps):
+        self.kinetic_energy = 0.0
+        self.max_penetration = 0.0
+        self.invalid_count = 0
+        self.sub_steps = sub_steps
+
+class StabilityPolicy:
+    def __init__(self, mode="remove", penetration_limit=0.25, boost=2, max_sub_steps=32, smoothing=0.05,
+                 quarantine_limit=256):
+        # mode: "remove" = 바로 삭제, "quarantine" = solver.quarantine 으로 격리
+        # quarantine_limit: 격리 목록에 남길 최근 입자 수. 오래 도는 서버에서 목록이 계속 자라지 않게 한다.
+        # penetration_limit: 평소 겹침(baseline)보다 r1 + r2 대비 이만큼 더 겹치면 sub-step 을 늘린다.
+        # 큰 더미는 쌓인 무게 때문에 항상 깊게 겹쳐 있으므로 절대 기준 대신 이동 평균과 비교한다.
+        self.mode = mode
+        self.penetration_limit = penetration_limit
+        self.boost = boost
+        self.max_sub_steps = max_sub_steps
+        self.smoothing = smoothing
+        self.quarantine_limit = quarantine_limit
+        self.baseline = None
+
+    def reset(self):
+        self.baseline = None
+
+    def handle_invalid(self, solver, invalid):
+        if self.mode == "quarantine":
+            if solver.quarantine.maxlen != self.quarantine_limit:
+                solver.quarantine = deque(solver.quarantine, maxlen=self.quarantine_limit)
+            solver.quarantine.extend(invalid)
+
+    def next_sub_steps(self, solver, diag):
+        # 겹침이 튀면 다음 프레임 한 번만 sub-step 을 늘린다
+        pen = diag.max_penetration
+        if self.baseline is None:
+            self.baseline = pen
+        spike = pen > self.baseline + self.penetration_limit
+        self.baseline += (pen - self.baseline) * self.smoothing
+        if spike:
+            return min(solver.sub_steps * self.boost, self.max_sub_steps)
+        return solver.sub_steps
@@ -1,6 +1,5 @@
 import pygame
 import sys
-import math
 from components.solver import Solver
 from components.input_handler import InputHandler
 
@@ -47,7 +46,6 @@ def main():
 
         sleeping_count = 0
         for p in solver.particles:
-            if math.isnan(p.pos.x) or math.isnan(p.pos.y): continue
             if not (-1000 < p.pos.x < WIDTH+1000): continue
             
             if p.is_sleeping: sleeping_count += 1
@@ -73,11 +71,19 @@ def main():
         opt_text = "ON (Spatial Grid)" if solver.use_optimization else "OFF (Brute Force)"
         opt_color = (100, 255, 100) if solver.use_optimization else (255, 100, 100)
         mat_text = input_handler.current_material.upper()
+        backend = solver.get_backend()
+        backend_text = backend.name.upper() if backend.status == "ready" else f"{backend.name.upper()} ({backend.status})"
+        diag = solver.diagnostics
+        step_color = (255, 200, 100) if diag.sub_steps > solver.sub_steps else (255, 255, 255)
         
         info = [
             (f"FPS         : {fps:.1f}", (255, 255, 255)),
             (f"Particles   : {len(solver.particles)}", (255, 255, 255)),
             (f"Optimize    : {opt_text}", opt_color),
+            (f"Backend     : {backend_text}", (255, 255, 255)),
+            (f"Sub-steps   : {diag.sub_steps}", step_color),
+            (f"Energy      : {diag.kinetic_energy:.3g}", (255, 255, 255)),
+            (f"Penetration : {diag.max_penetration:.0%}", (255, 255, 255)),
             ("-" * 28, (150, 150, 150)),
             (f"Material    : {mat_text}", (100, 200, 255)),
             ("Controls:", (255, 255, 0)),
@@ -86,7 +92,8 @@ def main():
             ("[L-Click] Spawn Particle", (200, 200, 200)),
             ("[R-Click] Place Wall", (200, 200, 200)),
             ("[G/F] Gravity / Force", (200, 200, 200)),
-            ("[O] Toggle Opt / [R] Reset", (200, 200, 200))
+            ("[O] Toggle Opt / [R] Reset", (200, 200, 200)),
+            ("[B] Toggle Backend", (200, 200, 200))
         ]
         
         for i, (text, color) in enumerate(info):
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import time
+from components.solver import Solver
+from components.obstacle import RectObstacle
+from components.server import SimulationServer, SimulationClient
+
+WIDTH, HEIGHT = 900, 900
+
+def make_solver():
+    solver = Solver(WIDTH, HEIGHT)
+    solver.add_obstacle(RectObstacle(WIDTH/2, HEIGHT - 20, WIDTH, 40))
+    return solver
+
+async def serve(args):
+    server = SimulationServer(make_solver(), frame_rate=args.rate)
+    await server.start(args.host, args.port, args.unix)
+    print("Serving on", args.unix or server.address)
+    await asyncio.Event().wait()
+
+async def subscriber(port, args, delay):
+    client = SimulationClient()
+    await client.connect(args.host, port, args.unix)
+    await client.command("subscribe")
+    received = 0
+    last_frame = -1
+    end = time.perf_counter() + args.duration
+    while time.perf_counter() < end:
+        try:
+            frame_no, _, _, _ = await asyncio.wait_for(client.next_frame(), end - time.perf_counter())
+        except asyncio.TimeoutError:
+            break
+        received += 1
+        last_frame = frame_no
+        if delay: await asyncio.sleep(delay)
+    # 프레임을 읽지 않고 있어도 명령 응답은 바로 와야 한다
+    stats = await asyncio.wait_for(client.command("stats"), 5.0)
+    await client.close()
+    return received, last_frame, stats["frame_no"], client.frames_skipped
+
+async def load_test(args):
+    server = SimulationServer(make_solver(), frame_rate=args.rate)
+    await server.start(args.host, 0, args.unix)
+    port = server.address[1] if args.unix is None else None
+
+    control = SimulationClient()
+    await control.connect(args.host, port, args.unix)
+    for i in range(10):
+        await control.command("spawn", x=200 + i * 50, y=200, type="water", cols=6, rows=6)
+
+    start_steps = server.steps
+    start = time.perf_counter()
+    # 마지막 클라이언트는 일부러 느리게 읽어서 프레임 드롭을 확인
+    slow_delay = 0.25
+    jobs = [subscriber(port, args, 0.0) for _ in range(args.load_test - 1)]
+    jobs.append(subscriber(port, args, slow_delay))
+    results = await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - start
+
+    stats = await control.command("stats")
+    await control.close()
+    await server.close()
+
+    frames = [r[0] for r in results]
+    print(f"Clients       : {len(results)}")
+    print(f"Particles     : {stats['particles']}")
+    print(f"Steps/sec     : {(server.steps - start_steps) / elapsed:.1f}")
+    print(f"Frames sent   : {server.frame_no}")
+    print(f"Frames/client : min {min(frames)} / max {max(frames)}")
+    received, last, latest, skipped = results[-1]
+    print(f"Slow client   : {received} frames, last #{last} of #{latest}, skipped {skipped}")
+    frame_rate = server.frame_no / elapsed
+    print(f"Frame rate    : {frame_rate:.1f} / {args.rate:.1f}")
+
+    # 느린 클라이언트도 밀린 프레임 없이 최신 프레임 근처에 있어야 한다
+    failures = []
+    for i, (received, last, latest, skipped) in enumerate(results):
+        delay = slow_delay if i == len(results) - 1 else 0.0
+        tolerance = int(args.rate * (delay + 0.5)) + 2
+        if latest - last > tolerance:
+            failures.append(f"client {i} is {latest - last} frames behind (limit {tolerance})")
+    if results[-1][0] >= results[-1][2]:
+        failures.append("slow client did not skip any frames")
+    # 스텝이 무거워져도 방송 주기는 설정값 근처를 유지해야 한다
+    if frame_rate < args.rate * 0.8:
+        failures.append(f"frame rate {frame_rate:.1f} is far below {args.rate:.1f}")
+    fast = [r[0] for r in results[:-1]]
+    if fast and min(fast) < args.rate * args.duration * 0.7:
+        failures.append(f"a fast client received only {min(fast)} frames")
+    if failures:
+        raise SystemExit("Load test failed:\n  " + "\n  ".join(failures))
+    print("Load test     : OK")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None)
+    parser.add_argument("--rate", type=float, default=30.0)
+    parser.add_argument("--load-test", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.load_test:
+        asyncio.run(load_test(args))
+    else:
+        asyncio.run(serve(args))
+
+if __name__ == "__main__":
+    main()
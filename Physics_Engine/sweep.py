@@ -0,0 +1,22 @@
+import argparse
+import json
+from components.batch import run_batch, expand_grid
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", help="JSON list of configs, or {\"base\": ..., \"grid\": ...}")
+    parser.add_argument("output")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        spec = json.load(f)
+    configs = expand_grid(spec["base"], spec["grid"]) if isinstance(spec, dict) else spec
+
+    def on_result(r):
+        print(f"{r['name']:40s} {r['status']:8s} {r['elapsed']:.1f}s")
+
+    run_batch(configs, args.output, args.workers, on_result=on_result)
+
+if __name__ == "__main__":
+    main()